@@ -13,6 +13,7 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 from lightController import set_color, ADDRESS
+from colorCorrection import ColorCorrection, profile_path
 import time
 
 class LightControlThread(QThread):
@@ -26,6 +27,7 @@ class LightControlThread(QThread):
         self.manual_color = (255, 255, 255)  # RGB
         self.brightness = 100
         self.brightness_override = None  # For manual brightness in screen sync mode
+        self.correction = ColorCorrection.load(profile_path(ADDRESS))  # Per-lamp calibration
         
     def set_manual_color(self, r, g, b):
         self.manual_color = (r, g, b)
@@ -60,15 +62,16 @@ class LightControlThread(QThread):
                         if self.brightness_override is not None:
                             brightness = self.brightness_override
                         else:
-                            luminance = 0.299*r + 0.587*g + 0.114*b
-                            brightness = max(5, int((luminance / 255) * 100))
+                            brightness = self.correction.brightness_for(r, g, b)
                     else:
                         # Use manual color and brightness
                         r, g, b = self.manual_color
                         brightness = self.brightness
                     
-                    # Send color to light
-                    await set_color(client, r, g, b, brightness=brightness)
+                    # Send calibrated color and brightness to light
+                    lamp_r, lamp_g, lamp_b = self.correction.correct(r, g, b)
+                    lamp_brightness = self.correction.correct_brightness(brightness)
+                    await set_color(client, lamp_r, lamp_g, lamp_b, brightness=lamp_brightness)
                     
                     # Update GUI
                     self.color_update.emit(r, g, b)
@@ -84,19 +87,10 @@ class LightControlThread(QThread):
         screenshot = ImageGrab.grab()
         img_array = np.array(screenshot)
         avg_color = np.mean(img_array.reshape(-1, 3), axis=0).astype(int)
-        r, g, b = avg_color
+        r, g, b = avg_color.tolist()
         
         # Enhance dark colors
-        luminance = 0.299*r + 0.587*g + 0.114*b
-        if luminance < 40:
-            max_component = max(r, g, b)
-            if max_component > 0:
-                scale = min(255 / max_component, 3)
-                r = min(255, int(r * scale))
-                g = min(255, int(g * scale))
-                b = min(255, int(b * scale))
-        
-        return r, g, b
+        return self.correction.enhance_dark(r, g, b)
             
     def stop_thread(self):
         self.running = False
@@ -0,0 +1,147 @@
+import json
+import os
+import numpy as np
+
+# Luminance weights (ITU-R BT.601) in thousandths, so luminance can be done in integer math
+LUMA_WEIGHTS = (299, 587, 114)
+
+# Scenes darker than this get their colors boosted so the lamp doesn't go flat
+DARK_LUMINANCE = 40
+
+# Luminance steps per level in the brightness curve table. Brightness changes every
+# 2.55 luminance, so 1/100 steps put every step edge exactly on a table entry
+LUMINANCE_STEPS = 100
+
+# Folder for per-lamp calibration profiles
+PROFILE_DIR = "profiles"
+
+def profile_path(address):
+    """Get the calibration profile path for a lamp address"""
+    return os.path.join(PROFILE_DIR, f"{address.replace(':', '').lower()}.json")
+
+class ColorCorrection:
+    """
+    Calibration stage between picked/screen colors and the lamp
+
+    All corrections are baked into lookup tables once, so the hot path
+    is just list indexing instead of per-channel Python math.
+    """
+
+    def __init__(self, gamma=(1.0, 1.0, 1.0), white_point=(1.0, 1.0, 1.0),
+                 dark_boost=3.0, brightness_gamma=1.0, min_brightness=5, lamp_gamma=1.0):
+        """
+        Args:
+            gamma: Per-channel gamma exponent (R, G, B), 1.0 = linear
+            white_point: Per-channel gain (R, G, B) in 0-1 to balance the lamp's white
+            dark_boost: Max scale applied to dark scenes (1.0 disables the boost)
+            brightness_gamma: Exponent of the screen luminance -> brightness curve
+            min_brightness: Lowest brightness picked from screen luminance (0-100)
+            lamp_gamma: Exponent of the lamp's brightness response, applied to every brightness sent
+
+        Raises:
+            ValueError: If a setting is out of range
+        """
+        self.gamma = tuple(float(v) for v in gamma)
+        self.white_point = tuple(float(v) for v in white_point)
+        self.dark_boost = float(dark_boost)
+        self.brightness_gamma = float(brightness_gamma)
+        self.min_brightness = int(min_brightness)
+        self.lamp_gamma = float(lamp_gamma)
+        self.validate()
+        self.build_tables()
+
+    def validate(self):
+        if len(self.gamma) != 3 or len(self.white_point) != 3:
+            raise ValueError("gamma and white_point need one value per channel (R, G, B)")
+        if not all(0.1 <= v <= 10 for v in self.gamma + (self.brightness_gamma, self.lamp_gamma)):
+            raise ValueError("Gamma values must be between 0.1 and 10")
+        if not all(0 <= v <= 1 for v in self.white_point):
+            raise ValueError("white_point values must be between 0 and 1")
+        if not 1 <= self.dark_boost <= 255:
+            raise ValueError("dark_boost must be between 1 and 255")
+        if not 0 <= self.min_brightness <= 100:
+            raise ValueError("min_brightness must be between 0 and 100")
+
+    def build_tables(self):
+        """(Re)build the lookup tables from the current settings"""
+        levels = np.arange(256, dtype=np.float64)
+
+        # Gamma + white point: one 256-entry table per channel
+        channel_lut = []
+        for c in range(3):
+            curve = 255.0 * (levels / 255.0) ** self.gamma[c] * self.white_point[c]
+            channel_lut.append(np.clip(np.rint(curve), 0, 255).astype(np.int64).tolist())
+        self.channel_lut = channel_lut
+
+        # Dark scene boost: row = brightest channel of the scene, column = channel value
+        peak = levels.reshape(-1, 1)
+        with np.errstate(divide="ignore"):
+            scale = np.minimum(255.0 / peak, self.dark_boost)
+        scale[0] = 1.0
+        self.boost_lut = np.minimum(255, (levels * scale).astype(np.int64)).tolist()
+
+        # Brightness curve: luminance (in 1/LUMINANCE_STEPS) -> brightness (0-100)
+        top = 255 * LUMINANCE_STEPS
+        index = np.arange(top + 1, dtype=np.int64)
+        if self.brightness_gamma == 1.0:
+            curve = index * 100 // top  # Integer math so step edges land exactly
+        else:
+            curve = ((index / top) ** self.brightness_gamma * 100).astype(np.int64)
+        self.luminance_lut = np.maximum(self.min_brightness, curve).tolist()
+
+        # Lamp response: requested brightness (0-100) -> brightness to send
+        requested = np.arange(101, dtype=np.float64)
+        response = np.rint(100 * (requested / 100) ** self.lamp_gamma).astype(np.int64)
+        response[1:] = np.maximum(response[1:], 1)  # Never turn the lamp off by rounding
+        self.brightness_lut = response.tolist()
+
+    def enhance_dark(self, r, g, b):
+        """Boost dark scenes so their color still shows on the lamp"""
+        if LUMA_WEIGHTS[0]*r + LUMA_WEIGHTS[1]*g + LUMA_WEIGHTS[2]*b >= DARK_LUMINANCE * 1000:
+            return r, g, b
+        row = self.boost_lut[max(r, g, b)]
+        return row[r], row[g], row[b]
+
+    def correct(self, r, g, b):
+        """Apply gamma and white point to a color before sending it to the lamp"""
+        lut = self.channel_lut
+        return lut[0][r], lut[1][g], lut[2][b]
+
+    def brightness_for(self, r, g, b):
+        """Get brightness (0-100) for a color from its luminance"""
+        luminance = LUMA_WEIGHTS[0]*r + LUMA_WEIGHTS[1]*g + LUMA_WEIGHTS[2]*b
+        return self.luminance_lut[luminance * LUMINANCE_STEPS // 1000]
+
+    def correct_brightness(self, brightness):
+        """Map a requested brightness (0-100) through the lamp's response curve"""
+        return self.brightness_lut[brightness]
+
+    def to_dict(self):
+        return {
+            "gamma": list(self.gamma),
+            "white_point": list(self.white_point),
+            "dark_boost": self.dark_boost,
+            "brightness_gamma": self.brightness_gamma,
+            "min_brightness": self.min_brightness,
+            "lamp_gamma": self.lamp_gamma,
+        }
+
+    def save(self, path):
+        """Save the calibration settings as a JSON profile"""
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(path, "w") as file:
+            json.dump(self.to_dict(), file, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        """Load a JSON profile, falling back to the defaults if it's missing or invalid"""
+        if not os.path.exists(path):
+            return cls()
+        try:
+            with open(path) as file:
+                return cls(**json.load(file))
+        except (OSError, ValueError, TypeError) as e:
+            print(f"⚠️ Couldn't load profile {path}, using defaults: {e}")
+            return cls()
@@ -0,0 +1,281 @@
+import argparse
+import math
+import struct
+import uuid
+
+from lightController import PayloadGenerator, CommandType, RgbCommand, CHAR_UUID
+
+# btsnoop file format (used by Android's "Bluetooth HCI snoop log")
+BTSNOOP_MAGIC = b"btsnoop\0"
+BTSNOOP_HEADER = struct.Struct(">8sII")       # magic, version, datalink
+BTSNOOP_RECORD = struct.Struct(">IIIIq")      # original length, included length, flags, drops, timestamp
+BTSNOOP_EPOCH = 0x00DCDDB30F2F8000            # btsnoop timestamps are microseconds since year 0
+DATALINK_HCI = 1001                           # Un-encapsulated HCI, packet type is in the flags
+DATALINK_H4 = 1002                            # HCI UART (H4), packet type is the first byte
+
+H4_ACL = 0x02
+ACL_HEADER = struct.Struct("<HH")             # handle + flags, length
+L2CAP_HEADER = struct.Struct("<HH")           # length, channel id
+L2CAP_ATT = 0x0004
+
+ATT_READ_BY_TYPE_RSP = 0x09
+ATT_WRITE_REQ = 0x12
+ATT_WRITE_CMD = 0x52
+
+# CHAR_UUID as it appears on the wire (128-bit UUIDs are little endian in ATT)
+CHAR_UUID_BYTES = uuid.UUID(CHAR_UUID).bytes[::-1]
+
+PAYLOAD_SIZE = 16
+
+def read_btsnoop(path):
+    """
+    Stream the ATT writes sent to the lamp from a btsnoop capture
+
+    Characteristic discovery in the capture is used to find the handle of
+    CHAR_UUID, so writes to other characteristics can be skipped.
+
+    Yields:
+        (timestamp, value_handle, char_handle, value) - char_handle is None until discovery has been seen
+    """
+    char_handles = {}  # ACL connection handle -> value handle of CHAR_UUID
+
+    with open(path, "rb") as file:
+        header = file.read(BTSNOOP_HEADER.size)
+        if len(header) < BTSNOOP_HEADER.size:
+            raise ValueError(f"{path} is not a btsnoop file")
+        magic, _, datalink = BTSNOOP_HEADER.unpack(header)
+        if magic != BTSNOOP_MAGIC:
+            raise ValueError(f"{path} is not a btsnoop file")
+        if datalink not in (DATALINK_HCI, DATALINK_H4):
+            raise ValueError(f"Unsupported btsnoop datalink type {datalink}")
+
+        while True:
+            header = file.read(BTSNOOP_RECORD.size)
+            if len(header) < BTSNOOP_RECORD.size:
+                break
+            _, length, flags, _, timestamp = BTSNOOP_RECORD.unpack(header)
+            packet = file.read(length)
+
+            # Only ACL data (not commands/events)
+            if datalink == DATALINK_H4:
+                if not packet or packet[0] != H4_ACL:
+                    continue
+                packet = packet[1:]
+            elif flags & 0x02:
+                continue
+
+            if len(packet) < ACL_HEADER.size + L2CAP_HEADER.size + 3:
+                continue
+            handle_flags, _ = ACL_HEADER.unpack_from(packet)
+            # Continuation fragments can't be parsed on their own, lamp writes fit in one fragment anyway
+            if (handle_flags >> 12) & 0x3 == 0x1:
+                continue
+            _, cid = L2CAP_HEADER.unpack_from(packet, ACL_HEADER.size)
+            if cid != L2CAP_ATT:
+                continue
+
+            connection = handle_flags & 0x0FFF
+            att = packet[ACL_HEADER.size + L2CAP_HEADER.size:]
+            opcode = att[0]
+            received = flags & 0x01
+
+            if received and opcode == ATT_READ_BY_TYPE_RSP:
+                # Characteristic declarations: handle(2) properties(1) value handle(2) uuid(16)
+                entry = att[1]
+                if entry == 21:
+                    for i in range(2, len(att) - entry + 1, entry):
+                        if att[i + 5:i + 21] == CHAR_UUID_BYTES:
+                            char_handles[connection] = att[i + 3] | att[i + 4] << 8
+            elif not received and opcode in (ATT_WRITE_REQ, ATT_WRITE_CMD):
+                value_handle = att[1] | att[2] << 8
+                seconds = (timestamp - BTSNOOP_EPOCH) / 1e6
+                yield seconds, value_handle, char_handles.get(connection), att[3:]
+
+def read_hex_lines(path):
+    """
+    Stream payloads from a text file with one hex payload per line
+
+    Lines can be "<hex>" or "<timestamp> <hex>", so the "Payload: ..."
+    lines logged by set_color work too. Blank lines and # comments are skipped.
+
+    Yields:
+        (timestamp, None, None, value) - timestamp is None when the line has none
+    """
+    with open(path) as file:
+        for line in file:
+            tokens = line.split()
+            if not tokens or tokens[0].startswith("#"):
+                continue
+            timestamp = None
+            if len(tokens) > 1:
+                try:
+                    timestamp = float(tokens[0])
+                except ValueError:
+                    pass
+            try:
+                value = bytes.fromhex(tokens[-1].replace(":", ""))
+            except ValueError:
+                continue
+            yield timestamp, None, None, value
+
+def read_capture(path):
+    """Pick the reader from the file contents"""
+    with open(path, "rb") as file:
+        magic = file.read(len(BTSNOOP_MAGIC))
+    if magic == BTSNOOP_MAGIC:
+        return read_btsnoop(path)
+    return read_hex_lines(path)
+
+def decode_writes(writes, batch_size=4096):
+    """
+    Decrypt and parse writes to the lamp in batches
+
+    Args:
+        writes: Iterable of (timestamp, value_handle, char_handle, value) from a reader
+        batch_size: Payloads decrypted per AES call
+
+    Yields:
+        (timestamp, command, plaintext) - command is None when the payload doesn't decode
+    """
+    generator = PayloadGenerator()
+    timestamps = []
+    ciphertexts = []
+
+    def flush():
+        plaintext = generator.decrypt_payloads(b"".join(ciphertexts))
+        for i, timestamp in enumerate(timestamps):
+            payload = plaintext[i * PAYLOAD_SIZE:(i + 1) * PAYLOAD_SIZE]
+            yield timestamp, generator.parse_payload(payload), payload
+        timestamps.clear()
+        ciphertexts.clear()
+
+    for timestamp, value_handle, char_handle, value in writes:
+        if len(value) != PAYLOAD_SIZE:
+            continue
+        # Without discovery in the capture, the header check in parse_payload does the filtering
+        if char_handle is not None and value_handle != char_handle:
+            continue
+        timestamps.append(timestamp)
+        ciphertexts.append(value)
+        if len(ciphertexts) >= batch_size:
+            yield from flush()
+
+    if ciphertexts:
+        yield from flush()
+
+class CommandStats:
+    """Running statistics for one command type, in constant memory"""
+
+    def __init__(self):
+        self.count = 0
+        self.duplicates = 0
+        self.first = None
+        self.last = None
+        self.last_payload = None
+        # Inter-arrival times (Welford's online mean/variance)
+        self.gaps = 0
+        self.gap_mean = 0.0
+        self.gap_m2 = 0.0
+        self.gap_min = math.inf
+        self.gap_max = 0.0
+        # Bitmask of the values seen at each payload byte, to spot fields still to be worked out
+        self.seen = [0] * PAYLOAD_SIZE
+
+    def add(self, timestamp, payload):
+        self.count += 1
+        if payload == self.last_payload:
+            self.duplicates += 1
+        self.last_payload = payload
+
+        for i, byte in enumerate(payload):
+            self.seen[i] |= 1 << byte
+
+        if timestamp is None:
+            return
+        if self.first is None:
+            self.first = timestamp
+        if self.last is not None:
+            gap = timestamp - self.last
+            self.gaps += 1
+            delta = gap - self.gap_mean
+            self.gap_mean += delta / self.gaps
+            self.gap_m2 += delta * (gap - self.gap_mean)
+            self.gap_min = min(self.gap_min, gap)
+            self.gap_max = max(self.gap_max, gap)
+        self.last = timestamp
+
+    def rate(self):
+        """Commands per second over the span of the capture"""
+        if self.first is None or self.last == self.first:
+            return None
+        return (self.count - 1) / (self.last - self.first)
+
+    def gap_stddev(self):
+        if self.gaps < 2:
+            return 0.0
+        return math.sqrt(self.gap_m2 / (self.gaps - 1))
+
+    def varying_bytes(self):
+        """Payload byte offsets that took more than one value"""
+        return [i for i, mask in enumerate(self.seen) if mask & (mask - 1)]
+
+def collect_stats(decoded, dump=False):
+    """
+    Gather per-command statistics from decode_writes output
+
+    Returns:
+        (stats by command type, number of payloads that failed to decode)
+    """
+    stats = {}
+    undecoded = 0
+
+    for timestamp, command, payload in decoded:
+        if command is None:
+            undecoded += 1
+            continue
+        if dump:
+            print(format_command(timestamp, command))
+        if command.type not in stats:
+            stats[command.type] = CommandStats()
+        stats[command.type].add(timestamp, payload)
+
+    return stats, undecoded
+
+def format_command(timestamp, command):
+    when = f"{timestamp:.6f}" if timestamp is not None else "-"
+    if isinstance(command, RgbCommand):
+        return (f"{when} RGB({command.red},{command.green},{command.blue}) "
+                f"Brightness: {command.brightness} Speed: {command.speed} Group: {command.group}")
+    name = command.type.name if isinstance(command.type, CommandType) else f"UNKNOWN({command.type})"
+    return f"{when} {name} Group: {command.group} Body: {command.body.hex()}"
+
+def print_report(stats, undecoded):
+    print("\n📊 Command statistics:")
+    for command_type, entry in sorted(stats.items()):
+        name = command_type.name if isinstance(command_type, CommandType) else f"UNKNOWN({command_type})"
+        print(f"\n{name}")
+        print(f"   Count: {entry.count}  Duplicates: {entry.duplicates}")
+        rate = entry.rate()
+        if rate is not None:
+            print(f"   Rate: {rate:.2f}/s")
+            print(f"   Inter-arrival: mean {entry.gap_mean * 1000:.1f} ms, stddev {entry.gap_stddev() * 1000:.1f} ms, "
+                  f"min {entry.gap_min * 1000:.1f} ms, max {entry.gap_max * 1000:.1f} ms")
+        print(f"   Varying bytes: {entry.varying_bytes()}")
+
+    if undecoded:
+        print(f"\n⚠️ {undecoded} payloads didn't decode (wrong characteristic or different key)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Decrypt and analyse captured lamp traffic")
+    parser.add_argument("capture", help="btsnoop file or text file with one hex payload per line")
+    parser.add_argument("--batch", type=int, default=4096, help="Payloads decrypted per batch")
+    parser.add_argument("--dump", action="store_true", help="Print every decoded command")
+    args = parser.parse_args()
+
+    print(f"🔍 Decoding {args.capture}")
+    decoded = decode_writes(read_capture(args.capture), args.batch)
+    stats, undecoded = collect_stats(decoded, args.dump)
+    print_report(stats, undecoded)
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 import asyncio
 import binascii
+from collections import namedtuple
 from enum import IntEnum
 from Crypto.Cipher import AES
 from bleak import BleakClient
@@ -19,6 +20,10 @@ class CommandType(IntEnum):
     SPEED = 6
     LIGHT = 7
 
+# Decoded (decrypted) payloads - type is a CommandType, or a plain int for unknown commands
+Command = namedtuple("Command", ["type", "group", "body"])
+RgbCommand = namedtuple("RgbCommand", ["type", "group", "red", "green", "blue", "brightness", "speed"])
+
 class PayloadGenerator:
     # Encryption key - directly converted from the C# code
     KEY = bytes([
@@ -82,6 +87,37 @@ class PayloadGenerator:
         
         return result
     
+    def decrypt_payloads(self, data):
+        """
+        Decrypt one or more encrypted payloads
+        
+        Args:
+            data: Concatenated 16 byte payloads (ECB lets a whole batch go in one call)
+            
+        Returns:
+            bytes: The decrypted payloads, in the same order
+        """
+        return self.cipher.decrypt(data)
+    
+    def parse_payload(self, payload):
+        """
+        Parse a decrypted payload into a command
+        
+        Returns:
+            RgbCommand/Command, or None if the payload doesn't have the protocol header
+        """
+        if len(payload) != 16 or payload[0:4] != self.HEADER:
+            return None
+        
+        try:
+            command_type = CommandType(payload[4])
+        except ValueError:
+            command_type = payload[4]
+        
+        if command_type == CommandType.RGB:
+            return RgbCommand(command_type, payload[5], payload[7], payload[8], payload[9], payload[10], payload[11])
+        return Command(command_type, payload[5], bytes(payload[6:16]))
+    
     def convert_to_hex_string(self, data):
         """Convert bytes to a lowercase hex string"""
         return ''.join(f'{b:02x}' for b in data)
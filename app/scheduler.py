@@ -0,0 +1,234 @@
+import asyncio
+import heapq
+import itertools
+import time
+from datetime import datetime
+from bleak import BleakClient
+
+from lightController import set_color, ADDRESS
+from colorCorrection import ColorCorrection, profile_path
+
+# Keyframes for the built-in programs: (fraction of duration, (r, g, b), brightness)
+SUNSET = [
+    (0.0, (255, 223, 120), 100),  # Warm daylight
+    (0.4, (255, 140, 40), 80),    # Golden hour
+    (0.7, (230, 60, 20), 50),     # Orange/red
+    (0.9, (120, 20, 60), 20),     # Dusk purple
+    (1.0, (40, 0, 30), 5),        # Night
+]
+
+SUNRISE = [(1.0 - t, color, brightness) for t, color, brightness in reversed(SUNSET)]
+
+class Transition:
+    """A fade from one scene to another, streamed as a handful of writes"""
+
+    def __init__(self, target, brightness, duration, max_steps, start=None):
+        self.target = target
+        self.brightness = brightness
+        self.duration = duration
+        self.max_steps = max_steps
+        self.steps = 1
+        self.start = start  # Known (r, g, b), brightness to fade from, e.g. the previous keyframe
+        self.start_color = None
+        self.start_brightness = None
+        self.start_time = None
+
+    def begin(self, deadline, color, brightness):
+        """
+        Start the fade at its scheduled deadline
+
+        Args:
+            deadline: When the fade was scheduled to start, steps are timed from this
+            color, brightness: Scene the lamp is showing, used if the fade has no known start (None if unknown)
+        """
+        if self.start is not None:
+            color, brightness = self.start
+        self.start_color = color
+        self.start_brightness = brightness
+        self.start_time = deadline
+        if color is None:
+            # Nothing to fade from, so switch straight to the target
+            self.steps = 1
+            self.duration = 0
+            return
+
+        # No point splitting a fade finer than one write a second, or than the values can change
+        delta = max(abs(z - a) for a, z in zip(color + (brightness,), self.target + (self.brightness,)))
+        self.steps = max(1, min(self.max_steps, int(self.duration), delta))
+
+    def scene_at(self, step):
+        """Interpolated (r, g, b), brightness for a step (0 - steps)"""
+        if step >= self.steps:
+            return self.target, self.brightness
+        t = step / self.steps
+        r, g, b = (round(a + (z - a) * t) for a, z in zip(self.start_color, self.target))
+        brightness = round(self.start_brightness + (self.brightness - self.start_brightness) * t)
+        return (r, g, b), brightness
+
+class SceneScheduler:
+    """
+    Runs timed scene transitions on the lamp
+
+    Upcoming writes are kept in a heap ordered by deadline and the loop
+    sleeps until the earliest one (or until a new one is scheduled), so
+    an idle schedule costs no CPU and no writes.
+    """
+
+    def __init__(self, client, correction=None, max_steps=30, initial=None):
+        """
+        Args:
+            client: Connected BleakClient instance
+            correction: ColorCorrection applied before each write (None = uncorrected)
+            max_steps: Most writes a single fade, or a whole program, will use
+            initial: Known (r, g, b), brightness of the lamp to fade from before the
+                first write. None = unknown, so a first fade switches straight to its target
+        """
+        self.client = client
+        self.correction = correction
+        self.max_steps = max_steps
+        self.color, self.brightness = initial if initial is not None else (None, None)
+        self._sent = None  # Last (color, brightness) actually written, to skip repeats
+        self.running = False
+        self._heap = []
+        self._counter = itertools.count()  # Tie-breaker so equal deadlines keep insertion order
+        self._wakeup = asyncio.Event()
+
+    def schedule(self, when, color, brightness=100, duration=0, max_steps=None):
+        """
+        Schedule a transition to a scene
+
+        Args:
+            when: datetime, or seconds from now
+            color: Target (r, g, b)
+            brightness: Target brightness (0-100)
+            duration: Fade length in seconds (0 = switch instantly)
+            max_steps: Most writes for this fade (None = the scheduler's max_steps)
+        """
+        if isinstance(when, datetime):
+            deadline = when.timestamp()
+        else:
+            deadline = time.time() + when
+
+        if max_steps is None:
+            max_steps = self.max_steps
+        self._push(deadline, Transition(tuple(color), brightness, duration, max_steps), 0)
+
+    def schedule_program(self, start, duration, keyframes):
+        """
+        Schedule a multi-keyframe program such as SUNSET or SUNRISE
+
+        The program's max_steps writes are split across its fades by length,
+        so the whole program costs about max_steps + 1 writes. Each fade starts
+        from the previous keyframe, so fades never pick up a half-finished
+        step of the one before.
+
+        Args:
+            start: datetime, or seconds from now
+            duration: Program length in seconds
+            keyframes: List of (fraction of duration, (r, g, b), brightness)
+        """
+        if isinstance(start, datetime):
+            start = start.timestamp()
+        else:
+            start = time.time() + start
+
+        first_t, first_color, first_brightness = keyframes[0]
+        self._push(start + first_t * duration, Transition(tuple(first_color), first_brightness, 0, 1), 0)
+
+        for (t0, color0, brightness0), (t1, color, brightness) in zip(keyframes, keyframes[1:]):
+            steps = max(1, int(self.max_steps * t1) - int(self.max_steps * t0))
+            transition = Transition(tuple(color), brightness, (t1 - t0) * duration, steps,
+                                    start=(tuple(color0), brightness0))
+            self._push(start + t0 * duration, transition, 0)
+
+    def _push(self, deadline, transition, step):
+        heapq.heappush(self._heap, (deadline, next(self._counter), transition, step))
+        self._wakeup.set()
+
+    async def _write(self, color, brightness):
+        r, g, b = color
+        lamp_brightness = brightness
+        if self.correction is not None:
+            r, g, b = self.correction.correct(r, g, b)
+            lamp_brightness = self.correction.correct_brightness(brightness)
+        await set_color(self.client, r, g, b, brightness=lamp_brightness)
+        self.color, self.brightness = color, brightness
+        self._sent = (color, brightness)
+
+    async def _fire(self, deadline, transition, step):
+        if step == 0:
+            transition.begin(deadline, self.color, self.brightness)
+            if transition.duration > 0:
+                # The lamp already shows the start of the fade, first write is one step in
+                self._push(transition.start_time + transition.duration / transition.steps, transition, 1)
+                return
+            step = 1
+
+        scene = transition.scene_at(step)
+        if scene != self._sent:
+            await self._write(*scene)
+
+        if step < transition.steps:
+            step += 1
+            deadline = transition.start_time + transition.duration * step / transition.steps
+            self._push(deadline, transition, step)
+
+    async def run(self, until_idle=True):
+        """
+        Process the schedule
+
+        Args:
+            until_idle: Return once nothing is left to do, otherwise wait for new entries until stop()
+        """
+        self.running = True
+        while self.running:
+            if not self._heap:
+                if until_idle:
+                    break
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            delay = self._heap[0][0] - time.time()
+            if delay > 0:
+                await self._sleep(delay)
+                continue
+
+            deadline, _, transition, step = heapq.heappop(self._heap)
+            await self._fire(deadline, transition, step)
+
+        self.running = False
+
+    async def _sleep(self, delay):
+        """Sleep until the next deadline, or until something new is scheduled"""
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), delay)
+        except asyncio.TimeoutError:
+            pass
+
+    def stop(self):
+        self.running = False
+        self._wakeup.set()
+
+async def run_sunset(duration=30 * 60):
+    """Play the sunset program on the lamp starting now"""
+    print(f"🔌 Connecting to device: {ADDRESS}")
+
+    try:
+        async with BleakClient(ADDRESS) as client:
+            print("✅ Connected successfully")
+
+            correction = ColorCorrection.load(profile_path(ADDRESS))
+            scheduler = SceneScheduler(client, correction)
+            scheduler.schedule_program(0, duration, SUNSET)
+
+            print(f"\n🌇 Running sunset over {duration // 60} minutes...")
+            await scheduler.run()
+            print("\n🏁 Sunset complete")
+
+    except Exception as e:
+        print(f"❌ Error: {e}")
+
+if __name__ == "__main__":
+    asyncio.run(run_sunset())
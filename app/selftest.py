@@ -0,0 +1,319 @@
+"""
+Hardware-free checks for the pure logic modules (no lamp needed)
+
+Run with: python selftest.py
+"""
+import asyncio
+import itertools
+import os
+import random
+import struct
+import tempfile
+import unittest
+
+import decode
+import scheduler
+from colorCorrection import ColorCorrection
+from lightController import PayloadGenerator, CommandType, RgbCommand, Command
+from scheduler import SceneScheduler, SUNSET
+
+def old_enhance_dark(r, g, b):
+    """Dark boost as it was done per channel in app.py before the lookup tables"""
+    luminance = 0.299*r + 0.587*g + 0.114*b
+    if luminance < 40:
+        max_component = max(r, g, b)
+        if max_component > 0:
+            scale = min(255 / max_component, 3)
+            r = min(255, int(r * scale))
+            g = min(255, int(g * scale))
+            b = min(255, int(b * scale))
+    return r, g, b
+
+class ColorCorrectionTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Every color up to 63 per channel (most of the dark boost range) plus a fixed sample of the rest
+        rng = random.Random(26)
+        cls.colors = list(itertools.product(range(64), repeat=3))
+        cls.colors += [tuple(rng.randint(0, 255) for _ in range(3)) for _ in range(50000)]
+
+    def setUp(self):
+        self.correction = ColorCorrection()
+
+    def test_defaults_match_old_dark_boost(self):
+        for color in self.colors:
+            if 299*color[0] + 587*color[1] + 114*color[2] == 40000:
+                continue  # Old float math put luminance exactly 40 under the threshold
+            self.assertEqual(self.correction.enhance_dark(*color), old_enhance_dark(*color))
+
+    def test_defaults_match_old_brightness(self):
+        for r, g, b in self.colors:
+            # The old max(5, int(luminance / 255 * 100)), done exactly in integers
+            expected = max(5, (299*r + 587*g + 114*b) // 2550)
+            self.assertEqual(self.correction.brightness_for(r, g, b), expected)
+
+    def test_defaults_are_identity(self):
+        for color in self.colors:
+            self.assertEqual(self.correction.correct(*color), color)
+        for brightness in range(101):
+            self.assertEqual(self.correction.correct_brightness(brightness), brightness)
+
+    def test_lamp_gamma_keeps_lamp_on(self):
+        correction = ColorCorrection(lamp_gamma=2.2)
+        self.assertEqual(correction.correct_brightness(0), 0)
+        self.assertEqual(correction.correct_brightness(1), 1)
+        self.assertEqual(correction.correct_brightness(100), 100)
+        self.assertLess(correction.correct_brightness(50), 50)
+
+    def test_profile_round_trip(self):
+        correction = ColorCorrection(gamma=(2.2, 2.0, 1.8), white_point=(1, 0.8, 0.6), lamp_gamma=1.5)
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "profiles", "lamp.json")
+            correction.save(path)
+            loaded = ColorCorrection.load(path)
+        self.assertEqual(loaded.to_dict(), correction.to_dict())
+        self.assertEqual(loaded.correct(128, 128, 128), correction.correct(128, 128, 128))
+
+    def test_bad_profiles_fall_back_to_defaults(self):
+        contents = ["{not json", '{"unknown": 1}', '{"min_brightness": 300}', '{"gamma": [0, 1, 1]}', "[1, 2]"]
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "lamp.json")
+            for content in contents:
+                with open(path, "w") as file:
+                    file.write(content)
+                self.assertEqual(ColorCorrection.load(path).to_dict(), ColorCorrection().to_dict())
+
+    def test_out_of_range_settings_rejected(self):
+        with self.assertRaises(ValueError):
+            ColorCorrection(min_brightness=300)
+        with self.assertRaises(ValueError):
+            ColorCorrection(gamma=(0, 1, 1))
+        with self.assertRaises(ValueError):
+            ColorCorrection(white_point=(1.5, 1, 1))
+
+class FakeClock:
+    """Stands in for the time module so scheduler tests don't really sleep"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+class FakeClockScheduler(SceneScheduler):
+    def __init__(self, clock, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.clock = clock
+
+    async def _sleep(self, delay):
+        self.clock.now += delay
+
+class SchedulerTest(unittest.TestCase):
+    def setUp(self):
+        # Record writes instead of sending them to a lamp, each one taking `latency` seconds
+        self.clock = FakeClock()
+        self.start = self.clock.now
+        self.latency = 0.0
+        self.writes = []
+
+        async def fake_set_color(client, red, green, blue, brightness=100, speed=100):
+            self.writes.append((round(self.clock.now - self.start, 6), (red, green, blue), brightness))
+            self.clock.now += self.latency
+
+        self.real_set_color = scheduler.set_color
+        self.real_time = scheduler.time
+        scheduler.set_color = fake_set_color
+        scheduler.time = self.clock
+
+    def tearDown(self):
+        scheduler.set_color = self.real_set_color
+        scheduler.time = self.real_time
+
+    def run_scheduler(self, setup, **kwargs):
+        async def main():
+            lamp = FakeClockScheduler(self.clock, None, **kwargs)
+            setup(lamp)
+            await lamp.run()
+            return lamp
+        return asyncio.run(main())
+
+    def test_fade_lands_on_its_deadlines(self):
+        self.run_scheduler(lambda lamp: lamp.schedule(0, (0, 0, 0), 0, duration=2),
+                           initial=((255, 255, 255), 100))
+        self.assertEqual(self.writes, [(1.0, (128, 128, 128), 50), (2.0, (0, 0, 0), 0)])
+
+    def test_instant_switch_writes_at_deadline(self):
+        self.run_scheduler(lambda lamp: lamp.schedule(0.5, (10, 20, 30), 40))
+        self.assertEqual(self.writes, [(0.5, (10, 20, 30), 40)])
+
+    def test_first_write_always_sent(self):
+        self.run_scheduler(lambda lamp: lamp.schedule(0, (255, 255, 255), 100),
+                           initial=((255, 255, 255), 100))
+        self.assertEqual(len(self.writes), 1)
+
+    def test_unknown_start_fade_switches_to_target(self):
+        self.run_scheduler(lambda lamp: lamp.schedule(0, (0, 0, 0), 0, duration=5))
+        self.assertEqual(self.writes, [(0.0, (0, 0, 0), 0)])
+
+    def test_repeated_scene_not_resent(self):
+        def setup(lamp):
+            lamp.schedule(0, (1, 2, 3), 50)
+            lamp.schedule(0.1, (1, 2, 3), 50)
+        self.run_scheduler(setup)
+        self.assertEqual(len(self.writes), 1)
+
+    def test_program_ends_on_time(self):
+        self.run_scheduler(lambda lamp: lamp.schedule_program(0, 3, SUNSET))
+        last_t, last_color, last_brightness = SUNSET[-1]
+        self.assertEqual(self.writes[-1], (3.0, last_color, last_brightness))
+
+    def test_program_never_moves_away_from_target(self):
+        self.latency = 0.003
+        self.run_scheduler(lambda lamp: lamp.schedule_program(0, 30 * 60, SUNSET))
+
+        self.assertEqual(self.writes[0][1:], SUNSET[0][1:])
+        self.assertLessEqual(len(self.writes), 31)
+        keyframe = 1
+        previous = SUNSET[0][1] + (SUNSET[0][2],)
+        for _, color, brightness in self.writes[1:]:
+            current = color + (brightness,)
+            target = SUNSET[keyframe][1] + (SUNSET[keyframe][2],)
+            for before, now, goal in zip(previous, current, target):
+                self.assertLessEqual(abs(goal - now), abs(goal - before), (previous, current, target))
+            if current == target:
+                keyframe += 1
+            previous = current
+        self.assertEqual(keyframe, len(SUNSET))
+
+    def test_program_write_budget(self):
+        async def main():
+            lamp = SceneScheduler(None)
+            lamp.schedule_program(0, 30 * 60, SUNSET)
+            return sum(transition.max_steps for _, _, transition, _ in lamp._heap if transition.duration)
+        self.assertEqual(asyncio.run(main()), 30)
+
+def att_packet(att, connection=0x0040, h4=True):
+    """Wrap an ATT PDU in L2CAP and ACL headers (and the H4 packet type)"""
+    l2cap = struct.pack("<HH", len(att), decode.L2CAP_ATT) + att
+    acl = struct.pack("<HH", connection | 0x2000, len(l2cap)) + l2cap
+    return bytes([decode.H4_ACL]) + acl if h4 else acl
+
+def write_packet(handle, value, h4=True):
+    return att_packet(bytes([decode.ATT_WRITE_CMD]) + struct.pack("<H", handle) + value, h4=h4)
+
+def discovery_packet(value_handle, h4=True):
+    """Read By Type Response declaring CHAR_UUID at value_handle"""
+    entry = struct.pack("<HBH", value_handle - 1, 0x0C, value_handle) + decode.CHAR_UUID_BYTES
+    return att_packet(bytes([decode.ATT_READ_BY_TYPE_RSP, len(entry)]) + entry, h4=h4)
+
+class DecodeTest(unittest.TestCase):
+    def setUp(self):
+        self.generator = PayloadGenerator()
+        self.folder = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def write_btsnoop(self, records, datalink=decode.DATALINK_H4):
+        """
+        Build a btsnoop capture
+
+        Args:
+            records: List of (seconds, flags, packet) - flags bit 0 = received, bit 1 = command/event
+        """
+        data = bytearray(decode.BTSNOOP_HEADER.pack(decode.BTSNOOP_MAGIC, 1, datalink))
+        for seconds, flags, packet in records:
+            timestamp = decode.BTSNOOP_EPOCH + round(seconds * 1e6)
+            data += decode.BTSNOOP_RECORD.pack(len(packet), len(packet), flags, 0, timestamp) + packet
+        path = os.path.join(self.folder.name, "capture.log")
+        with open(path, "wb") as file:
+            file.write(data)
+        return path
+
+    def write_text(self, text):
+        path = os.path.join(self.folder.name, "capture.txt")
+        with open(path, "w") as file:
+            file.write(text)
+        return path
+
+    def decode(self, path, batch_size=4096):
+        return list(decode.decode_writes(decode.read_capture(path), batch_size))
+
+    def test_btsnoop_learns_handle_and_skips_other_writes(self):
+        path = self.write_btsnoop([
+            (0.0, 1, discovery_packet(0x21)),
+            (0.1, 0, write_packet(0x30, self.generator.get_rgb_payload(9, 9, 9))),  # Other characteristic
+            (0.2, 0, write_packet(0x21, self.generator.get_rgb_payload(1, 2, 3, 50, 60))),
+            (0.3, 1, write_packet(0x21, self.generator.get_rgb_payload(4, 5, 6))),  # Received, not sent
+        ])
+        decoded = self.decode(path)
+        self.assertEqual(len(decoded), 1)
+        timestamp, command, _ = decoded[0]
+        self.assertAlmostEqual(timestamp, 0.2, places=6)
+        self.assertEqual(command, RgbCommand(CommandType.RGB, 1, 1, 2, 3, 50, 60))
+
+    def test_btsnoop_hci_datalink(self):
+        path = self.write_btsnoop([
+            (0.0, 0, write_packet(0x21, self.generator.get_rgb_payload(1, 2, 3), h4=False)),
+            (0.1, 2, write_packet(0x21, self.generator.get_rgb_payload(4, 5, 6), h4=False)),  # Command packet
+        ], datalink=decode.DATALINK_HCI)
+        commands = [command for _, command, _ in self.decode(path)]
+        self.assertEqual([(c.red, c.green, c.blue) for c in commands], [(1, 2, 3)])
+
+    def test_header_filters_without_discovery(self):
+        path = self.write_btsnoop([
+            (0.0, 0, write_packet(0x21, self.generator.get_rgb_payload(1, 2, 3))),
+            (0.1, 0, write_packet(0x30, bytes(16))),  # Doesn't decrypt to the protocol header
+            (0.2, 0, write_packet(0x30, bytes(8))),   # Wrong size, never decrypted
+        ])
+        stats, undecoded = decode.collect_stats(decode.decode_writes(decode.read_capture(path)))
+        self.assertEqual(stats[CommandType.RGB].count, 1)
+        self.assertEqual(undecoded, 1)
+
+    def test_batch_size_does_not_change_output(self):
+        records = [(i * 0.05, 0, write_packet(0x21, self.generator.get_rgb_payload(i % 256, 0, 0)))
+                   for i in range(10)]
+        path = self.write_btsnoop(records)
+        expected = self.decode(path, batch_size=4096)
+        self.assertEqual(len(expected), 10)
+        for batch_size in (1, 3, 10):
+            self.assertEqual(self.decode(path, batch_size), expected)
+
+    def test_truncated_btsnoop_rejected(self):
+        path = self.write_text("btsnoop\0ab")
+        with self.assertRaises(ValueError):
+            self.decode(path)
+
+    def test_hex_lines(self):
+        rgb = self.generator.get_rgb_payload(7, 8, 9).hex()
+        text = "\n".join([
+            "# capture",
+            "",
+            f"   Payload: {rgb}",       # As logged by set_color
+            f"1.5 {rgb}",
+            "2.0 not-hex",
+            self.generator.cipher.encrypt(bytes(PayloadGenerator.HEADER) + bytes([99, 1]) + bytes(10)).hex(),
+        ])
+        decoded = self.decode(self.write_text(text))
+        self.assertEqual([timestamp for timestamp, _, _ in decoded], [None, 1.5, None])
+        self.assertEqual(decoded[0][1], RgbCommand(CommandType.RGB, 1, 7, 8, 9, 100, 100))
+        self.assertEqual(decoded[2][1], Command(99, 1, bytes(10)))
+
+    def test_command_stats(self):
+        payloads = [(0.0, (1, 2, 3)), (0.1, (1, 2, 3)), (0.3, (4, 2, 3)), (0.6, (4, 2, 3))]
+        path = self.write_btsnoop([(t, 0, write_packet(0x21, self.generator.get_rgb_payload(*color)))
+                                   for t, color in payloads])
+        stats, undecoded = decode.collect_stats(decode.decode_writes(decode.read_capture(path)))
+        entry = stats[CommandType.RGB]
+        self.assertEqual(undecoded, 0)
+        self.assertEqual(entry.count, 4)
+        self.assertEqual(entry.duplicates, 2)
+        self.assertAlmostEqual(entry.rate(), 5.0)
+        self.assertAlmostEqual(entry.gap_mean, 0.2)
+        self.assertAlmostEqual(entry.gap_min, 0.1)
+        self.assertAlmostEqual(entry.gap_max, 0.3)
+        self.assertAlmostEqual(entry.gap_stddev(), 0.1)
+        self.assertEqual(entry.varying_bytes(), [7])
+
+if __name__ == "__main__":
+    unittest.main()